@@ -1,47 +1,54 @@
 """Langgraph Orchestration Agents Implementation."""
 
-import json
+import asyncio
+import atexit
+import contextvars
+import functools
+import hashlib
 import logging
-import os
+import sys
+import time
+from collections import OrderedDict
+from enum import Enum
 from pathlib import Path
-from typing import Optional, Literal
-from app.utils.triage_prompt import TRIAGE_AGENT_SYSTEM_PROMPT
-from app.utils.referral_builder import REFERRAL_BUILDER_SYSTEM_PROMPT
-from app.utils.clinical_guidance import CLINICAL_GUIDANCE_SYSTEM_PROMPT
-from langgraph.graph import StateGraph, END
-from langgraph.graph.state import CompiledStateGraph
+from typing import Annotated, Any, Literal, Optional, TypeVar
+
+import httpx
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda, ensure_config
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import BaseMessage
-from pydantic import BaseModel, Field, SecretStr
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.graph.state import CompiledStateGraph
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from typing_extensions import TypedDict
-from dotenv import load_dotenv
+
+from app.config import settings
+from app.utils.clinical_guidance import (
+    CLINICAL_GUIDANCE_SYSTEM_PROMPT,
+    CLINICAL_GUIDANCE_SYSTEM_PROMPT_SHA256,
+)
+from app.utils.referral_builder import (
+    REFERRAL_BUILDER_SYSTEM_PROMPT,
+    REFERRAL_BUILDER_SYSTEM_PROMPT_SHA256,
+)
+from app.utils.triage_prompt import (
+    TRIAGE_AGENT_SYSTEM_PROMPT,
+    TRIAGE_AGENT_SYSTEM_PROMPT_SHA256,
+    detect_red_flags,
+)
 
 _BACKEND_ROOT = Path(__file__).resolve().parents[1]
-load_dotenv(_BACKEND_ROOT / ".env", override=False)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-def _get_required_env(name: str) -> str:
-    """Return a required environment variable or raise a helpful error message."""
-    value = os.getenv(name)
-    if value:
-        return value
-
-    example_hint = (_BACKEND_ROOT / ".env.example").relative_to(_BACKEND_ROOT)
-    raise RuntimeError(
-        "Missing required Azure OpenAI setting '{name}'. "
-        "Create backend/.env (copy backend/{example} to backend/.env) "
-        "or export the variable before starting the API.".format(
-            name=name,
-            example=example_hint,
-        )
-    )
-
-
 # Pydantic Models for structured outputs
 class PatientInfo(BaseModel):
     """Structured patient information."""
+    model_config = ConfigDict(frozen=True)
+
     name: Optional[str] = None
     age: Optional[int] = None
     gender: Optional[str] = None
@@ -53,6 +60,8 @@ class PatientInfo(BaseModel):
 
 class MedicalCodes(BaseModel):
     """Medical coding information."""
+    model_config = ConfigDict(frozen=True)
+
     snomed_codes: list[str] = Field(default_factory=list, description="SNOMED CT codes")
     icd_codes: list[str] = Field(default_factory=list, description="ICD-10 codes")
 
@@ -60,6 +69,8 @@ class MedicalCodes(BaseModel):
 class PhysicianInfo(BaseModel):
     """Directory entry for available physicians."""
 
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     specialty: str
@@ -73,10 +84,14 @@ class PhysicianInfo(BaseModel):
 class TriageAgentOutput(BaseModel):
     """Structured output from Triage Agent."""
 
+    model_config = ConfigDict(frozen=True)
+
     symptoms: list[str] = Field(description="List of reported symptoms")
     chief_complaint: str = Field(description="Primary reason for visit")
     urgency_score: int = Field(ge=1, le=5, description="Urgency level 1 (low) to 5 (critical)")
-    red_flags: list[str] = Field(default_factory=list, description="Critical warning signs detected")
+    red_flags: list[str] = Field(
+        default_factory=list, description="Critical warning signs detected"
+    )
     assessment: str = Field(description="Clinical assessment summary")
     medical_codes: MedicalCodes = Field(description="SNOMED and ICD codes")
     handoff_ready: bool = Field(description="Whether sufficient info collected for referral")
@@ -86,17 +101,26 @@ class TriageAgentOutput(BaseModel):
     )
 
 
+class CareSetting(str, Enum):
+    """Care settings the clinical guidance agent can recommend."""
+
+    EMERGENCY_DEPARTMENT = "Emergency Department"
+    URGENT_CARE = "Urgent Care"
+    PRIMARY_CARE = "Primary Care"
+    SELF_CARE = "Self-care"
+    SPECIALIST = "Specialist"
+
+    def __str__(self) -> str:
+        return self.value
+
+
 class ClinicalGuidanceOutput(BaseModel):
     """Decision and guidance from the clinical guidance agent."""
 
+    model_config = ConfigDict(frozen=True)
+
     referral_required: bool = Field(description="Whether a referral to a physician is required")
-    recommended_setting: Literal[
-        "Emergency Department",
-        "Urgent Care",
-        "Primary Care",
-        "Self-care",
-        "Specialist",
-    ]
+    recommended_setting: CareSetting
     guidance_summary: str = Field(description="High-level summary of the decision")
     next_steps: list[str] = Field(
         default_factory=list,
@@ -106,6 +130,8 @@ class ClinicalGuidanceOutput(BaseModel):
 
 class ReferralPackageOutput(BaseModel):
     """Structured referral package output."""
+    model_config = ConfigDict(frozen=True)
+
     demographics: PatientInfo = Field(description="Patient demographic information")
     chief_complaint: str = Field(description="Primary complaint")
     history_present_illness: str = Field(description="Detailed history of present illness")
@@ -114,15 +140,24 @@ class ReferralPackageOutput(BaseModel):
     urgency_score: int = Field(ge=1, le=5, description="Urgency level")
     red_flags: list[str] = Field(default_factory=list, description="Critical warning signs")
     medical_codes: MedicalCodes = Field(description="Medical coding")
-    disposition: str = Field(description="Recommended care setting (ED, Urgent Care, Primary Care, etc.)")
+    disposition: str = Field(
+        description="Recommended care setting (ED, Urgent Care, Primary Care, etc.)"
+    )
     referral_notes: str = Field(description="Additional notes for receiving provider")
 
 
+# Shared read-only defaults for state lookups, so a miss doesn't build a new model
+_EMPTY_PATIENT_INFO = PatientInfo()
+_EMPTY_MEDICAL_CODES = MedicalCodes()
+_EMPTY_PATIENT_JSON = _EMPTY_PATIENT_INFO.model_dump_json()
+
+
 # State definition for LangGraph
 class TriageAgentState(TypedDict, total=False):
     """State for the multi-agent triage workflow."""
 
-    messages: list[BaseMessage]
+    # add_messages appends each turn to the checkpointed history instead of replacing it
+    messages: Annotated[list[BaseMessage], add_messages]
     symptoms: list[str]
     patient_info: PatientInfo
     urgency_score: int
@@ -134,222 +169,531 @@ class TriageAgentState(TypedDict, total=False):
     chief_complaint: str
     assessment: str
     referral_required: bool
-    recommended_setting: str
+    recommended_setting: CareSetting
     guidance_summary: str
     next_steps: list[str]
     selected_physician: Optional[PhysicianInfo]
     clarifying_question: Optional[str]
     clarification_attempts: int
+    triage_context: str
+
+
+# The graph's model when AZURE_OPENAI_AGENT_MODEL is unset
+_DEFAULT_AGENT_MODEL = "gpt-5"
+
 
 def _build_azure_model() -> ChatOpenAI:
     """Construct the Azure OpenAI client pointed at the v1 endpoint."""
-    endpoint = _get_required_env("AZURE_OPENAI_ENDPOINT").rstrip("/")
-    base_url = f"{endpoint}/openai/v1"
-    model_name = os.getenv("AZURE_OPENAI_AGENT_MODEL", "gpt-5")
+    # Share pooled HTTP/2 transports so concurrent sessions and the parallel graph branches
+    # multiplex over a few warm TLS connections instead of opening one per request
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=32)
+    http_async_client = httpx.AsyncClient(http2=True, limits=limits)
+    http_client = httpx.Client(http2=True, limits=limits)
+    atexit.register(http_client.close)
 
     return ChatOpenAI(
-        model=model_name,
-        base_url=base_url,
-        api_key=SecretStr(_get_required_env("AZURE_OPENAI_API_KEY")),
+        model=settings.azure_openai_agent_model or _DEFAULT_AGENT_MODEL,
+        base_url=settings.agent_base_url,
+        api_key=settings.azure_openai_api_key,
         temperature=0,
+        http_client=http_client,
+        http_async_client=http_async_client,
     )
 
 
 # Initialize Azure OpenAI model once so agent nodes can reuse it
 model = _build_azure_model()
 
+# Bind the structured-output runnables once; with_structured_output converts the
+# Pydantic schema on every call, so building them per request is wasted work.
+# Each agent sends a stable prompt_cache_key so Azure OpenAI routes requests sharing its
+# system-prompt prefix to the same cache; the key embeds the prompt's digest, so editing a
+# prompt moves it to a fresh cache automatically.
+_TRIAGE_LLM = model.with_structured_output(
+    TriageAgentOutput, prompt_cache_key=f"triage-{TRIAGE_AGENT_SYSTEM_PROMPT_SHA256[:16]}"
+)
+
+# The guidance agent runs on every escalated turn. Hand the client a JSON schema computed
+# once at import instead of the Pydantic class, which the OpenAI SDK re-walks into a
+# strict schema on each request. Strict mode makes the service enforce the schema, so the
+# flat payload is trusted and built with model_construct rather than re-validated.
+_GUIDANCE_SCHEMA: dict[str, Any] = ClinicalGuidanceOutput.model_json_schema()
+
+
+def _construct_guidance(data: dict[str, Any]) -> ClinicalGuidanceOutput:
+    """Build guidance from a schema-enforced payload, converting only the enum field."""
+    data["recommended_setting"] = CareSetting(data["recommended_setting"])
+    return ClinicalGuidanceOutput.model_construct(**data)
+
+
+_GUIDANCE_LLM = model.with_structured_output(
+    _GUIDANCE_SCHEMA,
+    method="json_schema",
+    strict=True,
+    prompt_cache_key=f"clinical-guidance-{CLINICAL_GUIDANCE_SYSTEM_PROMPT_SHA256[:16]}",
+) | RunnableLambda(_construct_guidance)
+_REFERRAL_LLM = model.with_structured_output(
+    ReferralPackageOutput,
+    prompt_cache_key=f"referral-builder-{REFERRAL_BUILDER_SYSTEM_PROMPT_SHA256[:16]}",
+)
+
+
+class _MicroBatcher:
+    """Coalesce concurrent ``ainvoke`` calls on a runnable into shared ``abatch`` requests.
+
+    When nothing is in flight a call is dispatched immediately. While a batch is
+    running, new calls queue up for ``window_seconds`` and are then sent together,
+    so batching only kicks in (and only adds latency) under concurrent load.
+
+    Each call keeps its own RunnableConfig, so callbacks from the calling graph
+    node (tracing, ``stream_mode="messages"`` token streaming) stay attached to
+    that caller's prompt rather than to whichever call opened the batch.
+    """
+
+    def __init__(self, runnable: Any, window_seconds: float = 0.02, max_concurrency: int = 16):
+        self._runnable = runnable
+        self._window_seconds = window_seconds
+        self._max_concurrency = max_concurrency
+        self._pending: list[tuple[Any, RunnableConfig, asyncio.Future[Any]]] = []
+        self._flush_task: Optional[asyncio.Task[None]] = None
+        self._in_flight = 0
+
+    async def ainvoke(self, prompt: Any) -> Any:
+        """Queue a prompt for the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[Any] = loop.create_future()
+        config = ensure_config()
+        config["max_concurrency"] = self._max_concurrency
+        self._pending.append((prompt, config, future))
+        if self._flush_task is None:
+            delay = self._window_seconds if self._in_flight else 0.0
+            # Start the flush from an empty context so it doesn't inherit this caller's run
+            self._flush_task = contextvars.Context().run(loop.create_task, self._flush(delay))
+        return await future
+
+    async def _flush(self, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        batch, self._pending = self._pending, []
+        self._flush_task = None
+
+        # Submit the whole batch first, then fan results back out to the waiters
+        self._in_flight += 1
+        try:
+            results = await self._runnable.abatch(
+                [prompt for prompt, _, _ in batch],
+                config=[config for _, config, _ in batch],
+                return_exceptions=True,
+            )
+        except Exception as exc:  # pragma: no cover - abatch reports per-item errors
+            results = [exc] * len(batch)
+        except BaseException:
+            # Cancelled (e.g. at shutdown): the fan-out below never runs, so release the
+            # callers now instead of leaving them waiting on a batch that won't finish
+            for _, _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+        finally:
+            self._in_flight -= 1
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():  # caller was cancelled while waiting
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_TRIAGE_BATCHER = _MicroBatcher(_TRIAGE_LLM)
+
 
 _PHYSICIANS_PATH = _BACKEND_ROOT / "app" / "data" / "physicians.json"
 
 
+_PHYSICIAN_LIST_ADAPTER = TypeAdapter(list[PhysicianInfo])
+
+
 def _load_physician_directory() -> list[PhysicianInfo]:
     """Load the physician directory from JSON once at startup."""
     if not _PHYSICIANS_PATH.exists():
         return []
 
+    # Parse and validate the whole file in pydantic-core; a bad entry is reported with its
+    # index instead of failing one constructor call at a time.
     try:
-        with _PHYSICIANS_PATH.open("r", encoding="utf-8") as fis:
-            raw_entries = json.load(fis)
+        return _PHYSICIAN_LIST_ADAPTER.validate_json(_PHYSICIANS_PATH.read_bytes())
     except Exception as exc:  # pragma: no cover - defensive logging path
         raise RuntimeError(f"Failed to load physician directory: {exc}") from exc
 
-    physicians: list[PhysicianInfo] = []
-    for entry in raw_entries:
-        try:
-            physicians.append(PhysicianInfo(**entry))
-        except Exception as exc:  # pragma: no cover - invalid entry
-            raise RuntimeError(f"Invalid physician entry: {entry}") from exc
-    return physicians
-
 
 PHYSICIAN_DIRECTORY = _load_physician_directory()
 
-
-def _select_physician(urgency_score: int, recommended_setting: str) -> Optional[PhysicianInfo]:
+# Care setting -> preferred physician specialty (lowercased). Specialty strings are
+# interned here and in the index so key comparisons short-circuit on identity.
+_PREFERRED_SPECIALTY_BY_SETTING = {
+    setting: sys.intern(specialty)
+    for setting, specialty in {
+        CareSetting.PRIMARY_CARE: "primary care",
+        CareSetting.SELF_CARE: "primary care",
+        CareSetting.URGENT_CARE: "urgent care",
+        CareSetting.EMERGENCY_DEPARTMENT: "emergency medicine",
+        CareSetting.SPECIALIST: "cardiology",
+    }.items()
+}
+
+
+def _build_urgency_indexes(
+    physicians: list[PhysicianInfo],
+) -> tuple[dict[int, list[PhysicianInfo]], dict[tuple[int, str], PhysicianInfo]]:
+    """Bucket physicians by urgency level and by (urgency level, lowercased specialty)."""
+    by_urgency: dict[int, list[PhysicianInfo]] = {}
+    by_urgency_specialty: dict[tuple[int, str], PhysicianInfo] = {}
+    for physician in physicians:
+        specialty = sys.intern(physician.specialty.lower())
+        for urgency in range(physician.urgency_min, physician.urgency_max + 1):
+            by_urgency.setdefault(urgency, []).append(physician)
+            # Directory order decides ties, matching the original first-match scan
+            by_urgency_specialty.setdefault((urgency, specialty), physician)
+    return by_urgency, by_urgency_specialty
+
+
+_URGENCY_INDEX, _URGENCY_SPECIALTY_INDEX = _build_urgency_indexes(PHYSICIAN_DIRECTORY)
+
+
+def _select_physician(
+    urgency_score: int, recommended_setting: Optional[CareSetting]
+) -> Optional[PhysicianInfo]:
     """Pick the best physician match using urgency and care setting."""
-    if not PHYSICIAN_DIRECTORY:
+    eligible = _URGENCY_INDEX.get(urgency_score)
+    if not eligible:
         return None
 
-    preferred_specialty_map = {
-        "primary care": "Primary Care",
-        "self-care": "Primary Care",
-        "urgent care": "Urgent Care",
-        "emergency department": "Emergency Medicine",
-        "specialist": "Cardiology",
-    }
-    preferred = preferred_specialty_map.get(recommended_setting.lower(), "") if recommended_setting else ""
+    if recommended_setting:
+        preferred = _PREFERRED_SPECIALTY_BY_SETTING.get(recommended_setting)
+        if preferred:
+            match = _URGENCY_SPECIALTY_INDEX.get((urgency_score, preferred))
+            if match is not None:
+                return match
+
+    return eligible[0]
+
+
+# Response cache for structured LLM calls. The model runs at temperature=0, so an
+# identical prompt yields an equivalent answer and can be served from memory. Entries are
+# process-wide and so shared across patients, but the key covers the full prompt (patient
+# context and transcript included), and a short TTL bounds how long clinical output lives.
+_RESPONSE_CACHE_TTL_SECONDS = 10 * 60
+_RESPONSE_CACHE_MAX_ENTRIES = settings.agent_response_cache_size
+_response_cache: "OrderedDict[str, tuple[float, BaseModel]]" = OrderedDict()
+
+_OutputT = TypeVar("_OutputT", bound=BaseModel)
+
+
+async def _cached_ainvoke(
+    structured_llm: Any, prompt: list[BaseMessage], output_cls: type[_OutputT]
+) -> _OutputT:
+    """Invoke a structured LLM, reusing the result of an identical earlier prompt."""
+    if _RESPONSE_CACHE_MAX_ENTRIES <= 0:
+        return await structured_llm.ainvoke(prompt)  # type: ignore[no-any-return]
+
+    digest = hashlib.sha256(output_cls.__name__.encode())
+    for message in prompt:
+        digest.update(f"\0{message.type}\0{message.content}".encode())
+    key = digest.hexdigest()
+    now = time.monotonic()
+    cached = _response_cache.get(key)
+    if cached is not None:
+        expires_at, cached_result = cached
+        if expires_at > now:
+            _response_cache.move_to_end(key)
+            return cached_result  # type: ignore[return-value]
+        del _response_cache[key]
+
+    result: _OutputT = await structured_llm.ainvoke(prompt)
+    _response_cache[key] = (now + _RESPONSE_CACHE_TTL_SECONDS, result)
+    while len(_response_cache) > _RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+    return result
+
+
+# Static instructions live in the leading system message so every call shares the
+# same prefix and Azure OpenAI's automatic prompt caching can reuse it; only the
+# per-patient context is sent in the trailing human message.
+_TRIAGE_SYSTEM_MESSAGE = SystemMessage(
+    content=f"""{TRIAGE_AGENT_SYSTEM_PROMPT.strip()}
+
+Based on the conversation, provide your clinical assessment with symptoms, urgency score
+(1-5), red flags, medical codes, and assessment summary.
+If insufficient information, set handoff_ready to false and indicate what information is
+still needed."""
+)
+_GUIDANCE_SYSTEM_MESSAGE = SystemMessage(
+    content=f"""{CLINICAL_GUIDANCE_SYSTEM_PROMPT.strip()}
+
+Provide your determination based on the triage summary and patient information."""
+)
+_REFERRAL_SYSTEM_MESSAGE = SystemMessage(
+    content=f"""{REFERRAL_BUILDER_SYSTEM_PROMPT.strip()}
+
+Create a complete referral package with all necessary information for the receiving provider."""
+)
+
+
+def _render_triage_context(state: TriageAgentState) -> str:
+    """Render the triage summary and patient information shared by downstream prompts."""
+    codes = state.get("medical_codes") or _EMPTY_MEDICAL_CODES
+    patient_info = state.get("patient_info")
+    patient_json = patient_info.model_dump_json() if patient_info else _EMPTY_PATIENT_JSON
+    return f"""Triage Summary:
+- Chief Complaint: {state.get('chief_complaint', 'Unknown')}
+- Symptoms: {', '.join(state.get('symptoms', ())) or 'None reported'}
+- Urgency Score: {state.get('urgency_score', 'Not assessed')}
+- Red Flags: {', '.join(state.get('red_flags', ())) or 'None reported'}
+- Assessment: {state.get('assessment', 'Not available')}
+- SNOMED Codes: {', '.join(codes.snomed_codes)}
+- ICD-10 Codes: {', '.join(codes.icd_codes)}
 
-    eligible = [
-        physician
-        for physician in PHYSICIAN_DIRECTORY
-        if physician.urgency_min <= urgency_score <= physician.urgency_max
+Patient Information:
+{patient_json}"""
+
+
+# Only the most recent turns are replayed to the triage LLM; older turns are represented
+# by the previous assessment so prompt size stays flat as sessions grow. Turns that fall
+# out of the window are also removed from the messages channel, so the state carried into
+# the next turn stays window-sized. This does not shrink checkpoint storage: a caller's
+# saver still keeps every earlier checkpoint version of a thread.
+_CONVERSATION_WINDOW = 8
+
+
+def _build_triage_prompt(
+    messages: list[BaseMessage], earlier_summary: Optional[str] = None
+) -> list[BaseMessage]:
+    """Pass the recent transcript through as chat messages instead of re-rendering it."""
+    if len(messages) <= _CONVERSATION_WINDOW:
+        return [_TRIAGE_SYSTEM_MESSAGE, *messages]
+    recent = messages[-_CONVERSATION_WINDOW:]
+    if not earlier_summary:
+        return [_TRIAGE_SYSTEM_MESSAGE, *recent]
+    return [
+        _TRIAGE_SYSTEM_MESSAGE,
+        SystemMessage(content=f"Summary of Earlier Conversation:\n{earlier_summary}"),
+        *recent,
     ]
 
-    if preferred:
-        for physician in eligible:
-            if physician.specialty.lower() == preferred.lower():
-                return physician
 
-    return eligible[0] if eligible else None
+def _build_low_acuity_referral(state: TriageAgentState) -> ReferralPackageOutput:
+    """Assemble a referral package from existing state without an LLM round trip."""
+    assessment = state.get("assessment", "Not available")
+    notes = [state.get("guidance_summary", ""), *state.get("next_steps", ())]
+    return ReferralPackageOutput.model_construct(
+        demographics=state.get("patient_info") or _EMPTY_PATIENT_INFO,
+        chief_complaint=state.get("chief_complaint", "Not specified"),
+        history_present_illness=assessment,
+        symptoms=state.get("symptoms", []),
+        assessment=assessment,
+        urgency_score=state["urgency_score"],
+        red_flags=[],
+        medical_codes=state.get("medical_codes") or _EMPTY_MEDICAL_CODES,
+        disposition=str(state.get("recommended_setting", CareSetting.PRIMARY_CARE)),
+        referral_notes="\n".join(note for note in notes if note),
+    )
+
+
+# Dispositions that follow directly from the triage result: emergencies (urgency 4-5 or
+# any red flag) always go to the ED and routine urgency-1 issues stay with self-care, so
+# only the ambiguous middle band is sent to the guidance LLM.
+_EMERGENCY_GUIDANCE = ClinicalGuidanceOutput(
+    referral_required=True,
+    recommended_setting=CareSetting.EMERGENCY_DEPARTMENT,
+    guidance_summary=(
+        "Triage found high-urgency symptoms or red flags that need emergency evaluation."
+    ),
+    next_steps=[
+        "Go to the nearest Emergency Department now, or call 911 if symptoms are severe.",
+        "Do not drive yourself if you feel faint, confused, or short of breath.",
+        "Bring a list of your current medications and allergies.",
+    ],
+)
+_SELF_CARE_GUIDANCE = ClinicalGuidanceOutput(
+    referral_required=False,
+    recommended_setting=CareSetting.SELF_CARE,
+    guidance_summary="Triage found routine, low-urgency symptoms suited to self-care.",
+    next_steps=[
+        "Rest, stay hydrated, and keep track of your symptoms.",
+        "Book a primary care visit if symptoms last more than a few days or get worse.",
+        "Seek care right away if any new or severe symptoms appear.",
+    ],
+)
+
+
+def _patient_mentions_red_flag(state: TriageAgentState) -> bool:
+    """Whether the patient's own messages name a red flag by keyword."""
+    return bool(
+        detect_red_flags(
+            "\n".join(
+                message.content
+                for message in state.get("messages", ())
+                if message.type == "human" and isinstance(message.content, str)
+            )
+        )
+    )
+
+
+def _rule_based_guidance(state: TriageAgentState) -> Optional[ClinicalGuidanceOutput]:
+    """Return the guidance for clear-cut triage results, or None when the LLM must decide."""
+    urgency_score = state.get("urgency_score", 0) or 0
+    if urgency_score >= 4 or state.get("red_flags"):
+        return _EMERGENCY_GUIDANCE
+    # A red-flag keyword the triage LLM didn't flag is not enough to send someone to the
+    # ED, but it is enough to withhold the canned self-care answer and let the LLM decide
+    if urgency_score == 1 and not _patient_mentions_red_flag(state):
+        return _SELF_CARE_GUIDANCE
+    return None
+
 
 # Agent Node Functions
-def triage_agent(state: TriageAgentState) -> TriageAgentState:
+async def triage_agent(state: TriageAgentState) -> TriageAgentState:
     """Triage agent that assesses symptoms and assigns urgency."""
     
-    logger.info("Starting triage agent with state: %s", state)
-
-    structured_llm = model.with_structured_output(TriageAgentOutput)
-    conversation_history = "\n".join([
-        f"{msg.type}: {msg.content}" for msg in state.get("messages", [])
-    ])
-    prompt = f"""
-{TRIAGE_AGENT_SYSTEM_PROMPT}
-
-Conversation History:
-{conversation_history}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Starting triage agent (state keys: %s)", sorted(state))
 
-Based on this conversation, provide your clinical assessment with symptoms, urgency score (1-5), red flags, medical codes, and assessment summary.
-If insufficient information, set handoff_ready to false and indicate what information is still needed.
-"""
+    messages = state.get("messages", [])
+    prompt = _build_triage_prompt(messages, state.get("assessment"))
     
     # Invoke LLM with structured output
-    result: TriageAgentOutput = structured_llm.invoke(prompt)  # type: ignore[assignment]
+    result = await _cached_ainvoke(_TRIAGE_BATCHER, prompt, TriageAgentOutput)
     
-    # Update state with triage results
-    state["symptoms"] = result.symptoms
-    state["urgency_score"] = result.urgency_score
-    state["red_flags"] = result.red_flags
-    state["medical_codes"] = result.medical_codes
-    state["handoff_ready"] = result.handoff_ready
-    state["chief_complaint"] = result.chief_complaint
-    state["assessment"] = result.assessment
-    state["clarifying_question"] = result.clarifying_question
-    state["current_agent"] = "triage"
+    # Return only the triage fields; LangGraph merges them into the checkpointed state
+    update: TriageAgentState = {
+        "symptoms": result.symptoms,
+        "urgency_score": result.urgency_score,
+        "red_flags": result.red_flags,
+        "medical_codes": result.medical_codes,
+        "handoff_ready": result.handoff_ready,
+        "chief_complaint": result.chief_complaint,
+        "assessment": result.assessment,
+        "clarifying_question": result.clarifying_question,
+        "current_agent": "triage",
+    }
+    if len(messages) > _CONVERSATION_WINDOW:
+        # add_messages assigns ids to every stored message; skip any passed in without one
+        update["messages"] = [
+            RemoveMessage(id=message.id)
+            for message in messages[:-_CONVERSATION_WINDOW]
+            if message.id is not None
+        ]
 
     previous_attempts = state.get("clarification_attempts", 0) or 0
     if result.handoff_ready or not result.clarifying_question:
-        state["clarification_attempts"] = 0
+        update["clarification_attempts"] = 0
     else:
         if previous_attempts >= 2:
-            state["handoff_ready"] = True
-            state["clarifying_question"] = None
-            state["clarification_attempts"] = 0
+            update["handoff_ready"] = True
+            update["clarifying_question"] = None
+            update["clarification_attempts"] = 0
         else:
-            state["clarification_attempts"] = previous_attempts + 1
+            update["clarification_attempts"] = previous_attempts + 1
     
-    print(f"\n[TRIAGE AGENT] Urgency: {result.urgency_score}, Red Flags: {result.red_flags}")
-    print(f"[TRIAGE AGENT] Handoff Ready: {result.handoff_ready}")
+    logger.info(
+        "[TRIAGE AGENT] Urgency: %s, Red Flags: %s, Handoff Ready: %s",
+        result.urgency_score,
+        result.red_flags,
+        result.handoff_ready,
+    )
     
-    logger.info("Completed triage agent with updated state: %s", state)
+    logger.debug(
+        "Completed triage agent: urgency=%s handoff_ready=%s clarification_attempts=%s",
+        update["urgency_score"],
+        update["handoff_ready"],
+        update["clarification_attempts"],
+    )
 
-    return state
+    return update
 
 
-def clinical_guidance_agent(state: TriageAgentState) -> TriageAgentState:
+async def clinical_guidance_agent(state: TriageAgentState) -> TriageAgentState:
     """Agent that determines referral necessity and next steps."""
 
-    logger.info("Starting clinical guidance agent with state: %s", state)
-
-    structured_llm = model.with_structured_output(ClinicalGuidanceOutput)
-    prompt = f"""{CLINICAL_GUIDANCE_SYSTEM_PROMPT}
-
-Triage Summary:
-- Chief Complaint: {state.get('chief_complaint', 'Unknown')}
-- Symptoms: {', '.join(state.get('symptoms', [])) or 'None reported'}
-- Urgency Score: {state.get('urgency_score', 'Not assessed')}
-- Red Flags: {', '.join(state.get('red_flags', [])) or 'None reported'}
-- Assessment: {state.get('assessment', 'Not available')}
-- SNOMED Codes: {', '.join(state.get('medical_codes', MedicalCodes()).snomed_codes)}
-- ICD-10 Codes: {', '.join(state.get('medical_codes', MedicalCodes()).icd_codes)}
-
-Patient Information:
-{state.get('patient_info', PatientInfo()).model_dump_json(indent=2)}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Starting clinical guidance agent (state keys: %s)", sorted(state))
 
-Provide your determination now."""
-
-    result: ClinicalGuidanceOutput = structured_llm.invoke(prompt)  # type: ignore[assignment]
-
-    state["referral_required"] = result.referral_required
-    state["recommended_setting"] = result.recommended_setting
-    state["guidance_summary"] = result.guidance_summary
-    state["next_steps"] = result.next_steps
-    state["current_agent"] = "clinical_guidance"
+    result = _rule_based_guidance(state)
+    if result is None:
+        context = _render_triage_context(state)
+        prompt = [_GUIDANCE_SYSTEM_MESSAGE, HumanMessage(content=context)]
+        result = await _cached_ainvoke(_GUIDANCE_LLM, prompt, ClinicalGuidanceOutput)
+    else:
+        # Clear the previous turn's checkpointed rendering so the referral builder redoes it
+        context = ""
 
-    print(
-        f"\n[CLINICAL GUIDANCE] Referral Required: {result.referral_required}, "
-        f"Setting: {result.recommended_setting}"
+    logger.info(
+        "[CLINICAL GUIDANCE] Referral Required: %s, Setting: %s",
+        result.referral_required,
+        result.recommended_setting,
     )
 
-    logger.info("Completed clinical guidance agent with updated state: %s", state)
+    logger.debug(
+        "Completed clinical guidance agent: referral_required=%s setting=%s",
+        result.referral_required,
+        result.recommended_setting,
+    )
 
-    return state
+    return {
+        "referral_required": result.referral_required,
+        "recommended_setting": result.recommended_setting,
+        "guidance_summary": result.guidance_summary,
+        "next_steps": result.next_steps,
+        "triage_context": context,
+        "current_agent": "clinical_guidance",
+    }
 
 
-def referral_builder_agent(state: TriageAgentState) -> TriageAgentState:
+async def referral_builder_agent(state: TriageAgentState) -> TriageAgentState:
     """Referral builder agent that creates comprehensive referral package."""
 
-    logger.info("Starting referral builder agent with state: %s", state)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Starting referral builder agent (state keys: %s)", sorted(state))
     if not state.get("referral_required"):
-        return state
+        return {}
+
+    urgency_score = state.get("urgency_score", 0) or 0
+    if (
+        1 <= urgency_score <= 2
+        and not state.get("red_flags")
+        and not _patient_mentions_red_flag(state)
+    ):
+        # Low-acuity referrals carry nothing beyond what triage and guidance produced
+        result = _build_low_acuity_referral(state)
+    else:
+        # Clinical guidance always runs first in the same pass, so reuse its rendering
+        context = state.get("triage_context") or _render_triage_context(state)
+        prompt = [_REFERRAL_SYSTEM_MESSAGE, HumanMessage(content=context)]
+        result = await _cached_ainvoke(_REFERRAL_LLM, prompt, ReferralPackageOutput)
 
-    # Create structured output model
-    structured_llm = model.with_structured_output(ReferralPackageOutput)
-    
-    # Build context from triage results
-    prompt = f"""{REFERRAL_BUILDER_SYSTEM_PROMPT}
+    logger.info("[REFERRAL BUILDER] Disposition: %s", result.disposition)
+    logger.debug("Completed referral builder agent: disposition=%s", result.disposition)
 
-Triage Assessment Results:
-- Chief Complaint: {state.get('chief_complaint', 'Not specified')}
-- Symptoms: {', '.join(state.get('symptoms', []))}
-- Urgency Score: {state.get('urgency_score', 'Not assessed')}
-- Red Flags: {', '.join(state.get('red_flags', [])) or 'None identified'}
-- Assessment: {state.get('assessment', 'Not available')}
-- SNOMED Codes: {', '.join(state.get('medical_codes', MedicalCodes()).snomed_codes)}
-- ICD-10 Codes: {', '.join(state.get('medical_codes', MedicalCodes()).icd_codes)}
+    return {"referral_package": result, "current_agent": "referral_builder"}
 
-Patient Information:
-{state.get('patient_info', PatientInfo()).model_dump_json(indent=2)}
 
-Create a complete referral package with all necessary information for the receiving provider."""
-    
-    # Invoke LLM with structured output
-    result: ReferralPackageOutput = structured_llm.invoke(prompt)  # type: ignore[assignment]
+async def physician_matcher_agent(state: TriageAgentState) -> TriageAgentState:
+    """Pick the physician for a referral alongside the referral builder's LLM call."""
 
     selected_physician = _select_physician(
-        state.get("urgency_score", 0), state.get("recommended_setting", "")
+        state.get("urgency_score", 0) or 0, state.get("recommended_setting")
     )
 
-    # Update state with referral package
-    state["referral_package"] = result
-    state["selected_physician"] = selected_physician
-    state["current_agent"] = "referral_builder"
-
-    print(f"\n[REFERRAL BUILDER] Disposition: {result.disposition}")
     if selected_physician:
-        print(f"[REFERRAL BUILDER] Physician: {selected_physician.name} ({selected_physician.specialty})")
-    
-    logger.info("Completed referral builder agent with updated state: %s", state)
-    return state
+        logger.info(
+            "[PHYSICIAN MATCHER] Physician: %s (%s)",
+            selected_physician.name,
+            selected_physician.specialty,
+        )
+
+    return {"selected_physician": selected_physician}
 
 
 # Routing Logic
@@ -365,23 +709,33 @@ def _route_after_triage(state: TriageAgentState) -> Literal["clinical_guidance",
     return "end"
 
 
-def _route_after_guidance(state: TriageAgentState) -> Literal["referral_builder", "end"]:
-    """Only invoke referral builder when guidance confirmed a referral is needed."""
+def _route_after_guidance(
+    state: TriageAgentState,
+) -> list[Literal["referral_builder", "physician_matcher", "end"]]:
+    """Fan out to referral building and physician matching when a referral is needed."""
 
     if state.get("referral_required"):
-        return "referral_builder"
-    return "end"
+        return ["referral_builder", "physician_matcher"]
+    return ["end"]
 
 
 # Build the graph
-def create_triage_graph() -> CompiledStateGraph:
-    """Create the two-agent triage workflow graph."""
+def create_triage_graph(
+    checkpointer: Optional[BaseCheckpointSaver[Any]] = None,
+) -> CompiledStateGraph:
+    """Create the triage workflow graph, optionally persisting state per thread.
+
+    With a checkpointer, each turn only sends its new messages under a ``thread_id``:
+    ``await graph.ainvoke({"messages": [HumanMessage(...)]},
+    {"configurable": {"thread_id": session_id}})``.
+    """
     workflow = StateGraph(TriageAgentState)
 
     # Add agent nodes
     workflow.add_node("triage", triage_agent)
     workflow.add_node("clinical_guidance", clinical_guidance_agent)
     workflow.add_node("referral_builder", referral_builder_agent)
+    workflow.add_node("physician_matcher", physician_matcher_agent)
     
     # Set entry point
     workflow.set_entry_point("triage")
@@ -401,15 +755,26 @@ def create_triage_graph() -> CompiledStateGraph:
         _route_after_guidance,
         {
             "referral_builder": "referral_builder",
+            "physician_matcher": "physician_matcher",
             "end": END,
         },
     )
     
-    # Referral builder always ends
+    # Referral builder and physician matcher run in the same step and both end
     workflow.add_edge("referral_builder", END)
+    workflow.add_edge("physician_matcher", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+
+@functools.lru_cache(maxsize=1)
+def get_triage_graph() -> CompiledStateGraph:
+    """Return the process-wide compiled triage graph, compiling it on first use."""
+    return create_triage_graph()
 
 
-# Create the graph instance
-triage_graph = create_triage_graph()
+# Compile at import so a preloading parent process shares the graph with forked workers.
+# Callers that want partial output can use
+# ``triage_graph.astream(..., stream_mode="messages")`` to receive each agent's tokens
+# as Azure OpenAI generates them, before the node's structured result is parsed.
+triage_graph = get_triage_graph()
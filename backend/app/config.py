@@ -0,0 +1,92 @@
+"""Environment-derived settings for the FastAPI backend, resolved once at import."""
+
+from pathlib import Path
+from typing import Optional
+
+from pydantic import SecretStr, ValidationError
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+_BACKEND_ROOT = Path(__file__).resolve().parents[1]
+
+
+class Settings(BaseSettings):
+    """Azure OpenAI and service tuning settings read from the environment or backend/.env."""
+
+    model_config = SettingsConfigDict(
+        env_file=_BACKEND_ROOT / ".env",
+        env_ignore_empty=True,
+        extra="ignore",
+        frozen=True,
+    )
+
+    azure_openai_endpoint: str
+    azure_openai_api_key: SecretStr
+    # Unset means each backend's own default: the LangGraph agents and the proxy differ
+    azure_openai_agent_model: Optional[str] = None
+
+    # Realtime voice sessions
+    azure_resource: Optional[str] = None
+    azure_openai_deployment_name: Optional[str] = None
+    azure_openai_realtime_voice: str = "alloy"
+    azure_openai_session_type: str = "realtime"
+    azure_openai_session_instructions: str = (
+        "You are a helpful virtual triage assistant. Listen to the patient and respond naturally."
+    )
+
+    # Browser origins allowed to call the API, as a JSON list
+    cors_allow_origins: tuple[str, ...] = ("http://localhost:5173",)
+
+    # Agent proxy tuning
+    agent_response_cache_size: int = 1024
+    max_concurrent_llm_calls: int = 32
+
+    @property
+    def agent_base_url(self) -> str:
+        """Azure OpenAI v1 base URL for the agent chat model."""
+        return f"{self.azure_openai_endpoint.rstrip('/')}/openai/v1"
+
+    @property
+    def azure_resource_name(self) -> Optional[str]:
+        """Return AZURE_RESOURCE, or derive the resource name from the OpenAI endpoint."""
+        if self.azure_resource:
+            return self.azure_resource
+        resource_part = (
+            self.azure_openai_endpoint.replace("https://", "").replace("http://", "").split("/")[0]
+        )
+        if not resource_part:
+            return None
+        if ".openai.azure.com" in resource_part:
+            return resource_part.split(".openai.azure.com")[0]
+        return resource_part.split(".")[0]
+
+    @property
+    def realtime_session_url(self) -> Optional[str]:
+        """Azure endpoint that mints ephemeral Realtime client secrets."""
+        resource = self.azure_resource_name
+        if not resource:
+            return None
+        return f"https://{resource}.openai.azure.com/openai/v1/realtime/client_secrets"
+
+
+def _load_settings() -> Settings:
+    """Build the settings, naming every missing required variable in one readable error."""
+    try:
+        return Settings()
+    except ValidationError as exc:
+        missing = [
+            str(error["loc"][0]).upper() for error in exc.errors() if error["type"] == "missing"
+        ]
+        if not missing:
+            raise
+        example_hint = (_BACKEND_ROOT / ".env.example").relative_to(_BACKEND_ROOT)
+        raise RuntimeError(
+            "Missing required Azure OpenAI setting(s): {names}. "
+            "Create backend/.env (copy backend/{example} to backend/.env) "
+            "or export the variables before starting the API.".format(
+                names=", ".join(missing),
+                example=example_hint,
+            )
+        ) from None
+
+
+settings = _load_settings()
@@ -1,22 +1,35 @@
 """Simplified FastAPI backend - proxy for agent LLM calls + session management."""
 
-import json
+import asyncio
+import functools
+import hashlib
 import logging
-import os
+import sys
 import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Literal, Optional
+from types import MappingProxyType
+from typing import Any, Literal, Optional, Union
 from uuid import uuid4
 import threading
 
 import httpx
+import orjson
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, SecretStr
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
 
+from app.config import settings
+
 # Load environment variables
 _BACKEND_ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(_BACKEND_ROOT / ".env", override=False)
@@ -24,16 +37,76 @@ load_dotenv(_BACKEND_ROOT / ".env", override=False)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Hold the pooled Azure HTTP/2 client, LLM concurrency slots and token refresher."""
+    # Created here rather than at import so the primitives bind to the serving loop
+    app.state.llm_slots = asyncio.Semaphore(_MAX_CONCURRENT_LLM_CALLS)
+    app.state.token_lock = asyncio.Lock()
+    # The blocking credential call runs in its own small pool, leaving the loop's default
+    # executor to everything else; token refreshes are serialized, so one thread suffices
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="azure-auth")
+    app.state.auth_executor = executor
+    app.state.azure_http = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    await _warm_azure_session_path(app.state.azure_http)
+    token_refresher = (
+        asyncio.create_task(_refresh_bearer_token_forever()) if _BEARER_AUTH_ENABLED else None
+    )
+    try:
+        yield
+    finally:
+        # Run teardown in its own task so a second Ctrl-C / SIGTERM cancelling the lifespan
+        # doesn't abort it halfway and leak the pooled Azure sockets
+        await asyncio.shield(
+            _close_app_resources(app.state.azure_http, executor, token_refresher)
+        )
+
+
+async def _close_app_resources(
+    client: httpx.AsyncClient,
+    executor: ThreadPoolExecutor,
+    token_refresher: Optional["asyncio.Task[None]"],
+) -> None:
+    """Stop the token refresher, close the Azure HTTP pool and release the auth threads."""
+    try:
+        if token_refresher is not None:
+            token_refresher.cancel()
+            await asyncio.gather(token_refresher, return_exceptions=True)
+        await client.aclose()
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def _warm_azure_session_path(client: httpx.AsyncClient) -> None:
+    """Fetch the bearer token and open the Azure connection before serving traffic.
+
+    Best-effort: a failure here is logged and the first /session call retries as usual.
+    """
+    if not _BEARER_AUTH_ENABLED:
+        return
+    try:
+        await get_bearer_token_async(_COGNITIVE_SERVICES_SCOPE)
+        await client.head(f"https://{_AZURE_RESOURCE}.openai.azure.com/")
+    except Exception as e:
+        logger.warning("Azure warmup skipped: %s", e)
+
+
 app = FastAPI(
     title="Real-time Virtual Triage",
     description="Real-time virtual triage backend API - Agent Proxy",
     version="0.2.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
+    allow_origins=list(settings.cors_allow_origins),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -41,11 +114,25 @@ app.add_middleware(
 
 # Token caching for DefaultAzureCredential
 cached_token: Optional[str] = None
-token_expiry: float = 0
+token_expiry: float = 0  # wall-clock expiry from Azure, kept for logging
+# Expiry on the monotonic clock, so freshness checks are immune to wall-clock jumps
+_token_deadline: float = 0
 token_lock = threading.Lock()
-
-# System prompts for each agent
-AGENT_PROMPTS = {
+# Reused across refreshes; building a DefaultAzureCredential probes every auth source
+_credential = DefaultAzureCredential()
+_COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+# Request paths refresh a token this close to expiry; the background refresher renews it
+# earlier so requests normally never wait on the credential. Both stay inside
+# azure-identity's own 5 minute refresh window: asked any earlier, the credential just
+# hands back its cached token.
+_TOKEN_REFRESH_MARGIN_SECONDS = 120
+_BACKGROUND_REFRESH_MARGIN_SECONDS = 240
+_BACKGROUND_REFRESH_RETRY_SECONDS = 60
+# Consecutive failures double the retry delay up to this cap instead of retrying every minute
+_BACKGROUND_REFRESH_MAX_RETRY_SECONDS = 30 * 60
+
+# System prompts for each agent (read-only)
+AGENT_PROMPTS = MappingProxyType({
     "triage": """You are an experienced triage nurse whose job is to collect just enough context for a downstream clinical guidance specialist to make the final severity decision.
 
 Your responsibilities:
@@ -111,27 +198,19 @@ Your responsibilities:
 8. Provide clear referral notes for receiving provider
 
 Create a professional, complete referral package that ensures continuity of care."""
-}
+})
 
 
-def _get_required_env(name: str) -> str:
-    """Return a required environment variable or raise a helpful error message."""
-    value = os.getenv(name)
-    if value:
-        return value
-    raise RuntimeError(f"Missing required environment variable: {name}")
+# The proxy's model when AZURE_OPENAI_AGENT_MODEL is unset
+_DEFAULT_AGENT_MODEL = "gpt-4o"
 
 
 def _build_azure_model() -> ChatOpenAI:
     """Construct the Azure OpenAI client."""
-    endpoint = _get_required_env("AZURE_OPENAI_ENDPOINT").rstrip("/")
-    base_url = f"{endpoint}/openai/v1"
-    model_name = os.getenv("AZURE_OPENAI_AGENT_MODEL", "gpt-4o")
-
     return ChatOpenAI(
-        model=model_name,
-        base_url=base_url,
-        api_key=SecretStr(_get_required_env("AZURE_OPENAI_API_KEY")),
+        model=settings.azure_openai_agent_model or _DEFAULT_AGENT_MODEL,
+        base_url=settings.agent_base_url,
+        api_key=settings.azure_openai_api_key,
         temperature=0,
     )
 
@@ -140,6 +219,33 @@ def _build_azure_model() -> ChatOpenAI:
 model = _build_azure_model()
 
 
+# Realtime session settings never change at runtime, so resolve them once at import
+_REALTIME_DEPLOYMENT = settings.azure_openai_deployment_name
+_REALTIME_VOICE = settings.azure_openai_realtime_voice
+_REALTIME_SESSION_TYPE = settings.azure_openai_session_type
+_REALTIME_SESSION_INSTRUCTIONS = settings.azure_openai_session_instructions
+_AZURE_RESOURCE = settings.azure_resource_name
+_REALTIME_SESSION_URL = settings.realtime_session_url
+# /session is the only caller of DefaultAzureCredential and refuses to run without a
+# realtime deployment, so API-key-only deployments never need a bearer token
+_BEARER_AUTH_ENABLED = bool(_REALTIME_DEPLOYMENT and _REALTIME_SESSION_URL)
+# The session request body is fully static, so encode it once instead of on every /session
+_REALTIME_SESSION_BODY = orjson.dumps(
+    {
+        "session": {
+            "type": _REALTIME_SESSION_TYPE,
+            "model": _REALTIME_DEPLOYMENT,
+            "instructions": _REALTIME_SESSION_INSTRUCTIONS,
+            "audio": {
+                "output": {
+                    "voice": _REALTIME_VOICE,
+                }
+            },
+        },
+    }
+)
+
+
 # Load physicians directory
 _PHYSICIANS_PATH = _BACKEND_ROOT / "app" / "data" / "physicians.json"
 
@@ -148,32 +254,47 @@ def _load_physicians() -> list[dict]:
     """Load physician directory from JSON."""
     if not _PHYSICIANS_PATH.exists():
         return []
-    with _PHYSICIANS_PATH.open("r", encoding="utf-8") as f:
-        return json.load(f)
+    return orjson.loads(_PHYSICIANS_PATH.read_bytes())
 
 
 PHYSICIANS = _load_physicians()
 
+# Care setting (lowercased) -> preferred physician specialty (lowercased). Specialty
+# strings are interned here and in the index so key comparisons short-circuit on identity.
+_PREFERRED_SPECIALTY_BY_SETTING = {
+    setting: sys.intern(specialty)
+    for setting, specialty in {
+        "primary care": "primary care",
+        "self-care": "primary care",
+        "urgent care": "urgent care",
+        "emergency department": "emergency medicine",
+        "specialist": "cardiology",
+    }.items()
+}
+
 
-def get_bearer_token(resource_scope: str) -> str:
+def get_bearer_token(
+    resource_scope: str, refresh_margin: float = _TOKEN_REFRESH_MARGIN_SECONDS
+) -> str:
     """Get a bearer token using DefaultAzureCredential with caching."""
-    global cached_token, token_expiry
+    global cached_token, token_expiry, _token_deadline
     
-    current_time = time.time()
+    current_time = time.monotonic()
     
     with token_lock:
-        if cached_token and current_time < (token_expiry - 300):
+        if cached_token and current_time < (_token_deadline - refresh_margin):
             return cached_token
     
     try:
-        credential = DefaultAzureCredential()
-        token = credential.get_token(resource_scope)
+        token = _credential.get_token(resource_scope)
         
         with token_lock:
             cached_token = token.token
             token_expiry = token.expires_on
+            _token_deadline = time.monotonic() + (token.expires_on - time.time())
             
-        logger.info("Acquired new bearer token, expires at: %s", time.ctime(token_expiry))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Acquired new bearer token, expires at: %s", time.ctime(token_expiry))
         return cached_token
         
     except Exception as e:
@@ -181,14 +302,55 @@ def get_bearer_token(resource_scope: str) -> str:
         raise
 
 
+async def get_bearer_token_async(
+    resource_scope: str, refresh_margin: float = _TOKEN_REFRESH_MARGIN_SECONDS
+) -> str:
+    """Get a cached bearer token, refreshing it in a worker thread off the event loop."""
+    if cached_token and time.monotonic() < (_token_deadline - refresh_margin):
+        return cached_token
+    # One refresh at a time; requests queued behind it pick up the new token from the cache
+    async with app.state.token_lock:
+        return await asyncio.get_running_loop().run_in_executor(
+            app.state.auth_executor, get_bearer_token, resource_scope, refresh_margin
+        )
+
+
+async def _refresh_bearer_token_forever() -> None:
+    """Renew the cached token ahead of expiry so /session requests only read the cache."""
+    retry_delay = _BACKGROUND_REFRESH_RETRY_SECONDS
+    while True:
+        delay = _token_deadline - _BACKGROUND_REFRESH_MARGIN_SECONDS - time.monotonic()
+        await asyncio.sleep(max(delay, retry_delay))
+        previous_token = cached_token
+        try:
+            token = await get_bearer_token_async(
+                _COGNITIVE_SERVICES_SCOPE, refresh_margin=_BACKGROUND_REFRESH_MARGIN_SECONDS
+            )
+        except Exception as e:
+            retry_delay = min(retry_delay * 2, _BACKGROUND_REFRESH_MAX_RETRY_SECONDS)
+            logger.warning(
+                "Background bearer token refresh failed, retrying in %ss: %s", retry_delay, e
+            )
+        else:
+            if token == previous_token:
+                # The credential returned its cached token; back off rather than ask again
+                retry_delay = min(retry_delay * 2, _BACKGROUND_REFRESH_MAX_RETRY_SECONDS)
+            else:
+                retry_delay = _BACKGROUND_REFRESH_RETRY_SECONDS
+
+
 # Pydantic models for structured outputs
 class MedicalCodes(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     snomed_codes: list[str] = Field(default_factory=list)
     icd_codes: list[str] = Field(default_factory=list)
 
 
 class TriageOutput(BaseModel):
     """Structured output from triage agent."""
+    model_config = ConfigDict(frozen=True)
+
     symptoms: list[str] = Field(description="List of reported symptoms")
     chief_complaint: str = Field(description="Primary reason for visit")
     urgency_score: int = Field(ge=1, le=5, description="Urgency level 1-5")
@@ -202,6 +364,8 @@ class TriageOutput(BaseModel):
 
 class ClinicalGuidanceOutput(BaseModel):
     """Structured output from clinical guidance agent."""
+    model_config = ConfigDict(frozen=True)
+
     referral_required: bool = Field(description="Whether referral is needed")
     recommended_setting: Literal[
         "Emergency Department", "Urgent Care", "Primary Care", "Self-care", "Specialist"
@@ -213,6 +377,8 @@ class ClinicalGuidanceOutput(BaseModel):
 
 class ReferralOutput(BaseModel):
     """Structured output from referral builder agent."""
+    model_config = ConfigDict(frozen=True)
+
     disposition: str = Field(description="Recommended care setting")
     urgency_score: int = Field(ge=1, le=5)
     history_present_illness: str = Field(description="HPI narrative")
@@ -220,6 +386,44 @@ class ReferralOutput(BaseModel):
     response_text: str = Field(description="Natural language response to the patient")
 
 
+# Prompt cache key per agent, embedding a digest of its system prompt computed once here
+# so Azure OpenAI routes calls sharing a prompt prefix to the same cache, and editing a
+# prompt moves it to a fresh one
+_PROMPT_CACHE_KEYS = MappingProxyType(
+    {
+        agent_type: f"proxy-{agent_type}-{hashlib.sha256(prompt.encode()).hexdigest()[:16]}"
+        for agent_type, prompt in AGENT_PROMPTS.items()
+    }
+)
+
+# Structured result of any agent, as carried in AgentInvokeResponse
+AgentOutput = Union[TriageOutput, ClinicalGuidanceOutput, ReferralOutput]
+
+# Bind the structured-output runnables once instead of rebuilding the schema per request
+_TRIAGE_LLM = model.with_structured_output(
+    TriageOutput, prompt_cache_key=_PROMPT_CACHE_KEYS["triage"]
+)
+_GUIDANCE_LLM = model.with_structured_output(
+    ClinicalGuidanceOutput, prompt_cache_key=_PROMPT_CACHE_KEYS["clinical_guidance"]
+)
+_REFERRAL_LLM = model.with_structured_output(
+    ReferralOutput, prompt_cache_key=_PROMPT_CACHE_KEYS["referral_builder"]
+)
+_AGENT_LLMS: dict[str, Runnable[LanguageModelInput, Any]] = {
+    "triage": _TRIAGE_LLM,
+    "clinical_guidance": _GUIDANCE_LLM,
+    "referral_builder": _REFERRAL_LLM,
+}
+
+# Prebuilt system message per agent; never mutated, so every call shares the same dict
+_AGENT_SYSTEM_MESSAGES = MappingProxyType(
+    {
+        agent_type: {"role": "system", "content": prompt}
+        for agent_type, prompt in AGENT_PROMPTS.items()
+    }
+)
+
+
 # Request/Response models
 class AgentInvokeRequest(BaseModel):
     """Request to invoke an agent."""
@@ -233,17 +437,22 @@ class AgentInvokeResponse(BaseModel):
     """Response from agent invocation."""
     agent_type: str
     response_text: str
-    structured_output: dict
+    # The agent's own model instance, serialized directly instead of via an interim dict
+    structured_output: AgentOutput
 
 
 class ClientSecret(BaseModel):
     """Ephemeral key payload."""
+    model_config = ConfigDict(frozen=True)
+
     value: str
     expires_at: Optional[int] = None
 
 
 class SessionResponse(BaseModel):
     """Response for session creation."""
+    model_config = ConfigDict(frozen=True)
+
     session_id: str
     client_secret: ClientSecret
     model: str
@@ -253,6 +462,8 @@ class SessionResponse(BaseModel):
 
 class PhysicianInfo(BaseModel):
     """Physician info for lookup."""
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     specialty: str
@@ -263,103 +474,185 @@ class PhysicianInfo(BaseModel):
     contact_email: Optional[str] = None
 
 
+# The directory is fixed for the process lifetime, so validate and encode the /physicians
+# body once; clients can revalidate with If-None-Match against its ETag
+_PHYSICIAN_MODELS = [PhysicianInfo(**p) for p in PHYSICIANS]
+_PHYSICIANS_BODY = orjson.dumps(
+    [physician.model_dump(exclude_none=True) for physician in _PHYSICIAN_MODELS]
+)
+_PHYSICIANS_ETAG = f'"{hashlib.blake2b(_PHYSICIANS_BODY, digest_size=8).hexdigest()}"'
+
+
+def _index_physician_matches(
+    physicians: list[PhysicianInfo],
+) -> tuple[dict[tuple[int, str], PhysicianInfo], dict[int, PhysicianInfo]]:
+    """Precompute /physicians/match answers.
+
+    Returns the first physician in directory order for each (urgency, lowercased specialty)
+    pair, and the first physician covering each urgency regardless of specialty.
+    """
+    by_urgency_and_specialty: dict[tuple[int, str], PhysicianInfo] = {}
+    by_urgency: dict[int, PhysicianInfo] = {}
+    for physician in physicians:
+        specialty = sys.intern(physician.specialty.lower())
+        for urgency in range(physician.urgency_min, physician.urgency_max + 1):
+            by_urgency_and_specialty.setdefault((urgency, specialty), physician)
+            by_urgency.setdefault(urgency, physician)
+    return by_urgency_and_specialty, by_urgency
+
+
+_PHYSICIAN_BY_URGENCY_AND_SPECIALTY, _FIRST_PHYSICIAN_BY_URGENCY = _index_physician_matches(
+    _PHYSICIAN_MODELS
+)
+
+
+# Response cache for /agent/invoke. The model runs at temperature=0, so a retried or
+# repeated request with the same message, history and context gets the same answer.
+# Entries are process-wide and so shared across patients, but only a byte-identical
+# request (the whole transcript and context included) can hit one, and a short TTL keeps
+# them from outliving the retries they exist for.
+_RESPONSE_CACHE_TTL_SECONDS = 10 * 60
+_RESPONSE_CACHE_MAX_ENTRIES = settings.agent_response_cache_size
+_response_cache: "OrderedDict[str, tuple[float, AgentInvokeResponse]]" = OrderedDict()
+
+
+# In-flight /agent/invoke calls by request key, shared with identical concurrent requests
+_inflight_invokes: dict[str, "asyncio.Future[AgentInvokeResponse]"] = {}
+
+# Cap concurrent LLM calls so a slow Azure backend sheds load with 503s instead of
+# queueing an unbounded backlog of requests in memory.
+_MAX_CONCURRENT_LLM_CALLS = settings.max_concurrent_llm_calls
+_LLM_SLOT_WAIT_SECONDS = 0.5
+
+
+def _agent_busy_error() -> HTTPException:
+    """Build the 503 returned when every LLM slot is taken."""
+    logger.warning(
+        "Rejecting agent call: %s LLM calls already in flight", _MAX_CONCURRENT_LLM_CALLS
+    )
+    return HTTPException(
+        status_code=503,
+        detail="Agent service is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _acquire_llm_slot() -> asyncio.Semaphore:
+    """Wait briefly for an LLM slot, answering 503 when the service is saturated."""
+    slots: asyncio.Semaphore = app.state.llm_slots
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=_LLM_SLOT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise _agent_busy_error()
+    return slots
+
+
+def _invoke_cache_key(request: AgentInvokeRequest) -> str:
+    """Hash the parts of an invoke request that determine the agent's answer."""
+    payload = orjson.dumps(
+        [
+            request.agent_type,
+            request.user_message,
+            request.conversation_history,
+            request.context,
+        ],
+        option=orjson.OPT_SORT_KEYS,
+    )
+    return hashlib.sha256(payload).hexdigest()
+
+
+def _get_cached_response(key: str) -> Optional[AgentInvokeResponse]:
+    """Return a live cached response, dropping it if it has expired."""
+    cached = _response_cache.get(key)
+    if cached is None:
+        return None
+    expires_at, response = cached
+    if expires_at <= time.monotonic():
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return response
+
+
+def _store_response(key: str, response: AgentInvokeResponse) -> None:
+    """Cache a response, evicting the least recently used entries past the size cap."""
+    _response_cache[key] = (time.monotonic() + _RESPONSE_CACHE_TTL_SECONDS, response)
+    while len(_response_cache) > _RESPONSE_CACHE_MAX_ENTRIES:
+        _response_cache.popitem(last=False)
+
+
 # Endpoints
 
 @app.get("/")
-async def root():
+async def root() -> dict[str, str]:
     """Root endpoint."""
     return {"message": "Real-time Virtual Triage API - Agent Proxy"}
 
 
 @app.get("/health")
-async def health():
+async def health() -> dict[str, str]:
     """Health check endpoint."""
     return {"status": "healthy"}
 
 
-@app.post("/session", response_model=SessionResponse)
+@app.post("/session", response_model=SessionResponse, response_model_exclude_none=True)
 async def create_session() -> SessionResponse:
     """Generate an ephemeral key for Azure OpenAI Realtime session."""
     try:
-        deployment = os.environ["AZURE_OPENAI_DEPLOYMENT_NAME"]
-        voice = os.getenv("AZURE_OPENAI_REALTIME_VOICE", "alloy") or "alloy"
-        session_type = os.getenv("AZURE_OPENAI_SESSION_TYPE", "realtime") or "realtime"
-        session_instructions = os.getenv(
-            "AZURE_OPENAI_SESSION_INSTRUCTIONS",
-            "You are a helpful virtual triage assistant. Listen to the patient and respond naturally."
+        deployment = _REALTIME_DEPLOYMENT
+        if not deployment:
+            raise ValueError("AZURE_OPENAI_DEPLOYMENT_NAME must be set")
+        session_url = _REALTIME_SESSION_URL
+        if not session_url:
+            raise ValueError("Either AZURE_RESOURCE or AZURE_OPENAI_ENDPOINT must be set")
+
+        bearer_token = await get_bearer_token_async(_COGNITIVE_SERVICES_SCOPE)
+
+        logger.debug("Creating Azure Realtime session at %s", session_url)
+
+        client: httpx.AsyncClient = app.state.azure_http
+        response = await client.post(
+            session_url,
+            content=_REALTIME_SESSION_BODY,
+            headers={
+                "Authorization": f"Bearer {bearer_token}",
+                "Content-Type": "application/json"
+            }
         )
 
-        azure_resource = os.getenv("AZURE_RESOURCE")
-        if not azure_resource:
-            endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "")
-            if endpoint:
-                resource_part = endpoint.replace("https://", "").replace("http://", "").split("/")[0]
-                if ".openai.azure.com" in resource_part:
-                    azure_resource = resource_part.split(".openai.azure.com")[0]
-                else:
-                    azure_resource = resource_part.split(".")[0]
-            else:
-                raise ValueError("Either AZURE_RESOURCE or AZURE_OPENAI_ENDPOINT must be set")
-
-        bearer_token = get_bearer_token("https://cognitiveservices.azure.com/.default")
-
-        session_url = f"https://{azure_resource}.openai.azure.com/openai/v1/realtime/client_secrets"
-        logger.info("Creating Azure Realtime session at %s", session_url)
-
-        payload = {
-            "session": {
-                "type": session_type,
-                "model": deployment,
-                "instructions": session_instructions,
-                "audio": {
-                    "output": {
-                        "voice": voice,
-                    }
-                },
-            },
-        }
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                session_url,
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {bearer_token}",
-                    "Content-Type": "application/json"
-                }
+        if response.status_code != 200:
+            logger.error("Session request failed with status %s", response.status_code)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Session request failure body: %s", response.text)
+            raise HTTPException(
+                status_code=response.status_code,
+                detail={"error": "Failed to create session", "body": response.text},
             )
 
-            if response.status_code != 200:
-                logger.error("Request failed with status %s: %s", response.status_code, response.text)
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail={"error": "Failed to create session", "body": response.text},
-                )
-
-            session_payload = response.json()
-            client_secret_payload = session_payload.get("client_secret") or {}
-            secret_value = client_secret_payload.get("value") or session_payload.get("value")
-
-            if not secret_value:
-                raise HTTPException(status_code=500, detail="Azure response missing client secret")
-
-            session_id = (
-                session_payload.get("session_id")
-                or session_payload.get("id")
-                or session_payload.get("session", {}).get("id")
-                or str(uuid4())
-            )
+        session_payload = orjson.loads(response.content)
+        client_secret_payload = session_payload.get("client_secret") or {}
+        secret_value = client_secret_payload.get("value") or session_payload.get("value")
 
-            return SessionResponse(
-                session_id=session_id,
-                client_secret=ClientSecret(
-                    value=secret_value,
-                    expires_at=client_secret_payload.get("expires_at"),
-                ),
-                model=session_payload.get("model", deployment),
-                voice=session_payload.get("voice", "alloy"),
-                session_ttl_seconds=1800,
-            )
+        if not secret_value:
+            raise HTTPException(status_code=500, detail="Azure response missing client secret")
+
+        session_id = (
+            session_payload.get("session_id")
+            or session_payload.get("id")
+            or session_payload.get("session", {}).get("id")
+            or str(uuid4())
+        )
+
+        return SessionResponse(
+            session_id=session_id,
+            client_secret=ClientSecret(
+                value=secret_value,
+                expires_at=client_secret_payload.get("expires_at"),
+            ),
+            model=session_payload.get("model", deployment),
+            voice=session_payload.get("voice", "alloy"),
+            session_ttl_seconds=1800,
+        )
 
     except HTTPException:
         raise
@@ -368,6 +661,76 @@ async def create_session() -> SessionResponse:
         raise HTTPException(status_code=500, detail={"error": str(exc)}) from exc
 
 
+# The frontend sends the whole transcript every turn; older turns are already reflected
+# in the context it forwards, so only the last 20 exchanges are replayed to the model.
+_MAX_HISTORY_MESSAGES = 40
+
+# Fixed closing instructions for each agent's user prompt, built once instead of per call
+_TRIAGE_INSTRUCTIONS = (
+    "Analyze the conversation and provide your triage assessment. "
+    "Include a natural response_text to say back to the patient."
+)
+_FOLLOW_UP_INSTRUCTIONS = {
+    "clinical_guidance": (
+        "\nBased on the triage findings above, determine the appropriate care setting and "
+        "provide clinical guidance.\n"
+        "Include a natural response_text to communicate the guidance to the patient."
+    ),
+    "referral_builder": (
+        "\nCreate a comprehensive referral package based on the triage and clinical "
+        "guidance findings.\n"
+        "Include a natural response_text to inform the patient about the referral."
+    ),
+}
+
+
+def _prepare_agent_call(
+    request: AgentInvokeRequest,
+) -> tuple[Runnable[LanguageModelInput, Any], list[dict[str, str]]]:
+    """Pick the structured LLM for the agent and build its chat messages."""
+    agent_type = request.agent_type
+    system_message = _AGENT_SYSTEM_MESSAGES.get(agent_type)
+    structured_llm = _AGENT_LLMS.get(agent_type)
+
+    if system_message is None or structured_llm is None:
+        raise HTTPException(status_code=400, detail=f"Unknown agent type: {agent_type}")
+
+    # Build conversation for the LLM from the most recent turns only
+    conversation_text = "".join(
+        f"{msg.get('role', 'user')}: {msg.get('content', '')}\n"
+        for msg in request.conversation_history[-_MAX_HISTORY_MESSAGES:]
+    )
+
+    # Add context if provided
+    context_text = ""
+    if request.context:
+        context_json = orjson.dumps(request.context, option=orjson.OPT_INDENT_2).decode()
+        context_text = f"\nCurrent Context:\n{context_json}\n"
+
+    # Build the full prompt
+    if agent_type == "triage":
+        user_prompt = (
+            f"{context_text}\nConversation History:\n{conversation_text}\n\n"
+            f"Latest Patient Message: {request.user_message}\n\n{_TRIAGE_INSTRUCTIONS}"
+        )
+    else:
+        user_prompt = context_text + _FOLLOW_UP_INSTRUCTIONS[agent_type]
+
+    return structured_llm, [
+        system_message,
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def _to_invoke_response(agent_type: str, result: AgentOutput) -> AgentInvokeResponse:
+    """Wrap a structured agent result in the API response model."""
+    return AgentInvokeResponse(
+        agent_type=agent_type,
+        response_text=result.response_text,
+        structured_output=result,
+    )
+
+
 @app.post("/agent/invoke", response_model=AgentInvokeResponse)
 async def invoke_agent(request: AgentInvokeRequest) -> AgentInvokeResponse:
     """
@@ -376,113 +739,125 @@ async def invoke_agent(request: AgentInvokeRequest) -> AgentInvokeResponse:
     This is a stateless proxy - the frontend manages all state and orchestration.
     """
     agent_type = request.agent_type
-    system_prompt = AGENT_PROMPTS.get(agent_type)
-    
-    if not system_prompt:
-        raise HTTPException(status_code=400, detail=f"Unknown agent type: {agent_type}")
-    
+    structured_llm, messages = _prepare_agent_call(request)
+    cache_key = _invoke_cache_key(request)
+
+    if _RESPONSE_CACHE_MAX_ENTRIES > 0:
+        cached = _get_cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+    # Double clicks and client retries send the same request while the first is still
+    # running; let them await that call instead of paying for a second LLM round trip.
+    # The call runs in its own task, so one caller disconnecting doesn't cancel it for the
+    # others still waiting on it.
+    inflight = _inflight_invokes.get(cache_key)
+    if inflight is None:
+        inflight = asyncio.ensure_future(
+            _run_agent_call(agent_type, structured_llm, messages, cache_key)
+        )
+        _inflight_invokes[cache_key] = inflight
+        inflight.add_done_callback(functools.partial(_forget_inflight_invoke, cache_key))
+    return await asyncio.shield(inflight)
+
+
+async def _run_agent_call(
+    agent_type: str,
+    structured_llm: Runnable[LanguageModelInput, Any],
+    messages: list[dict[str, str]],
+    cache_key: str,
+) -> AgentInvokeResponse:
+    """Call the agent's LLM under a concurrency slot and cache the response."""
     try:
-        # Build conversation for the LLM
-        conversation_text = ""
-        for msg in request.conversation_history:
-            role = msg.get("role", "user")
-            content = msg.get("content", "")
-            conversation_text += f"{role}: {content}\n"
-        
-        # Add context if provided
-        context_text = ""
-        if request.context:
-            context_text = f"\nCurrent Context:\n{json.dumps(request.context, indent=2)}\n"
-        
-        # Build the full prompt
-        if agent_type == "triage":
-            user_prompt = f"""{context_text}
-Conversation History:
-{conversation_text}
-
-Latest Patient Message: {request.user_message}
-
-Analyze the conversation and provide your triage assessment. Include a natural response_text to say back to the patient."""
-            
-            structured_llm = model.with_structured_output(TriageOutput)
-            result: TriageOutput = structured_llm.invoke([
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ])
-            
-            return AgentInvokeResponse(
-                agent_type=agent_type,
-                response_text=result.response_text,
-                structured_output=result.model_dump()
-            )
-            
-        elif agent_type == "clinical_guidance":
-            user_prompt = f"""{context_text}
-Based on the triage findings above, determine the appropriate care setting and provide clinical guidance.
-Include a natural response_text to communicate the guidance to the patient."""
-            
-            structured_llm = model.with_structured_output(ClinicalGuidanceOutput)
-            result: ClinicalGuidanceOutput = structured_llm.invoke([
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ])
-            
-            return AgentInvokeResponse(
-                agent_type=agent_type,
-                response_text=result.response_text,
-                structured_output=result.model_dump()
-            )
-            
-        elif agent_type == "referral_builder":
-            user_prompt = f"""{context_text}
-Create a comprehensive referral package based on the triage and clinical guidance findings.
-Include a natural response_text to inform the patient about the referral."""
-            
-            structured_llm = model.with_structured_output(ReferralOutput)
-            result: ReferralOutput = structured_llm.invoke([
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ])
-            
-            return AgentInvokeResponse(
-                agent_type=agent_type,
-                response_text=result.response_text,
-                structured_output=result.model_dump()
-            )
-        
-        raise HTTPException(status_code=400, detail=f"Unhandled agent type: {agent_type}")
-        
+        slots = await _acquire_llm_slot()
+        try:
+            result = await structured_llm.ainvoke(messages)
+        finally:
+            slots.release()
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error invoking agent %s", agent_type)
         raise HTTPException(status_code=500, detail=f"Agent invocation failed: {str(e)}") from e
 
+    response = _to_invoke_response(agent_type, result)
+    if _RESPONSE_CACHE_MAX_ENTRIES > 0:
+        _store_response(cache_key, response)
+    return response
+
+
+def _forget_inflight_invoke(cache_key: str, task: "asyncio.Future[AgentInvokeResponse]") -> None:
+    """Unregister a finished call so the next identical request starts a fresh one."""
+    if _inflight_invokes.get(cache_key) is task:
+        del _inflight_invokes[cache_key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved so a failure with no callers left isn't logged again
+
+
+def _sse_event(event: str, data: bytes) -> bytes:
+    """Frame one server-sent event."""
+    return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+@app.post("/agent/invoke/stream")
+async def invoke_agent_stream(request: AgentInvokeRequest) -> StreamingResponse:
+    """
+    Invoke an agent and stream its output as server-sent events.
 
-@app.get("/physicians", response_model=list[PhysicianInfo])
-async def get_physicians():
+    ``delta`` events carry the model's raw JSON tokens as they arrive so the client can
+    show progress; a final ``result`` event carries the same body as ``/agent/invoke``.
+    """
+    agent_type = request.agent_type
+    structured_llm, messages = _prepare_agent_call(request)
+    # Answer an obviously saturated service with a plain 503; the slot itself is only taken
+    # once the body starts streaming, so a client that never reads it can't leak one
+    if app.state.llm_slots.locked():
+        raise _agent_busy_error()
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            slots = await _acquire_llm_slot()
+        except HTTPException as e:
+            yield _sse_event("error", orjson.dumps({"detail": e.detail}))
+            return
+        try:
+            async for event in structured_llm.astream_events(messages, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    delta = event["data"]["chunk"].content
+                    if delta:
+                        yield _sse_event("delta", orjson.dumps({"delta": delta}))
+                elif kind == "on_chain_end" and not event["parent_ids"]:
+                    response = _to_invoke_response(agent_type, event["data"]["output"])
+                    yield _sse_event("result", response.model_dump_json().encode())
+        except Exception as e:
+            logger.exception("Error streaming agent %s", agent_type)
+            yield _sse_event("error", orjson.dumps({"detail": f"Agent invocation failed: {e}"}))
+        finally:
+            slots.release()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get(
+    "/physicians",
+    response_model=list[PhysicianInfo],
+    responses={304: {"description": "Directory unchanged since the client's ETag"}},
+)
+async def get_physicians(request: Request) -> Response:
     """Get all available physicians."""
-    return [PhysicianInfo(**p) for p in PHYSICIANS]
+    headers = {"ETag": _PHYSICIANS_ETAG}
+    if request.headers.get("if-none-match") == _PHYSICIANS_ETAG:
+        return Response(status_code=304, headers=headers)
+    return Response(content=_PHYSICIANS_BODY, media_type="application/json", headers=headers)
 
 
-@app.get("/physicians/match")
+@app.get("/physicians/match", response_model_exclude_none=True)
 async def match_physician(urgency: int, setting: str) -> Optional[PhysicianInfo]:
     """Find a matching physician based on urgency and care setting."""
-    preferred_specialty_map = {
-        "primary care": "Primary Care",
-        "self-care": "Primary Care",
-        "urgent care": "Urgent Care",
-        "emergency department": "Emergency Medicine",
-        "specialist": "Cardiology",
-    }
-    preferred = preferred_specialty_map.get(setting.lower(), "")
-    
-    eligible = [
-        p for p in PHYSICIANS
-        if p["urgency_min"] <= urgency <= p["urgency_max"]
-    ]
-    
+    preferred = _PREFERRED_SPECIALTY_BY_SETTING.get(setting.lower())
     if preferred:
-        for p in eligible:
-            if p["specialty"].lower() == preferred.lower():
-                return PhysicianInfo(**p)
-    
-    return PhysicianInfo(**eligible[0]) if eligible else None
+        match = _PHYSICIAN_BY_URGENCY_AND_SPECIALTY.get((urgency, preferred))
+        if match is not None:
+            return match
+    return _FIRST_PHYSICIAN_BY_URGENCY.get(urgency)
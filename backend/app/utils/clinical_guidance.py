@@ -1,5 +1,7 @@
 """Prompts for the clinical guidance agent."""
 
+import hashlib
+
 CLINICAL_GUIDANCE_SYSTEM_PROMPT: str = """
 You are a clinical guidance specialist who interprets triage data and determines the
 appropriate level of care.
@@ -16,4 +18,8 @@ Responsibilities:
 4. Provide a concise guidance summary explaining the decision.
 5. List 2-4 actionable next steps for the patient. If referral is required, include
     preparation next steps; if not, include monitoring/self-care or follow-up advice.
-"""
\ No newline at end of file
+"""
+
+CLINICAL_GUIDANCE_SYSTEM_PROMPT_SHA256: str = hashlib.sha256(
+    CLINICAL_GUIDANCE_SYSTEM_PROMPT.encode("utf-8")
+).hexdigest()
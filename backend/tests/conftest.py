@@ -0,0 +1,7 @@
+"""Shared pytest setup for the backend tests."""
+
+import os
+
+# app.config requires the Azure settings at import; the tests never call Azure
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
@@ -0,0 +1,119 @@
+"""Tests for the LangGraph agents' rule-based shortcuts and LLM micro-batching."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agents import (
+    _EMERGENCY_GUIDANCE,
+    _SELF_CARE_GUIDANCE,
+    CareSetting,
+    TriageAgentState,
+    _MicroBatcher,
+    _rule_based_guidance,
+    referral_builder_agent,
+)
+
+
+@pytest.mark.parametrize(
+    ("urgency_score", "red_flags", "expected"),
+    [
+        (1, [], _SELF_CARE_GUIDANCE),
+        (2, [], None),
+        (3, [], None),
+        (4, [], _EMERGENCY_GUIDANCE),
+        (5, [], _EMERGENCY_GUIDANCE),
+        (1, ["chest pain"], _EMERGENCY_GUIDANCE),
+        (3, ["chest pain"], _EMERGENCY_GUIDANCE),
+    ],
+)
+def test_rule_based_guidance_by_urgency_and_red_flags(urgency_score, red_flags, expected) -> None:
+    state: TriageAgentState = {
+        "urgency_score": urgency_score,
+        "red_flags": red_flags,
+        "messages": [HumanMessage(content="I have had a sore throat since yesterday.")],
+    }
+    assert _rule_based_guidance(state) is expected
+
+
+def test_self_care_shortcut_applies_without_red_flag_keywords() -> None:
+    state: TriageAgentState = {
+        "urgency_score": 1,
+        "messages": [HumanMessage(content="Just a runny nose for a day.")],
+    }
+    assert _rule_based_guidance(state) is _SELF_CARE_GUIDANCE
+
+
+def test_red_flag_keyword_withholds_self_care_shortcut() -> None:
+    state: TriageAgentState = {
+        "urgency_score": 1,
+        "messages": [HumanMessage(content="Sometimes I get short of breath and passed out once.")],
+    }
+    assert _rule_based_guidance(state) is None
+
+
+def test_red_flag_keywords_from_the_assistant_are_ignored() -> None:
+    state: TriageAgentState = {
+        "urgency_score": 1,
+        "messages": [
+            AIMessage(content="Have you had any chest pain?"),
+            HumanMessage(content="No, just a runny nose."),
+        ],
+    }
+    assert _rule_based_guidance(state) is _SELF_CARE_GUIDANCE
+
+
+async def test_red_flag_keyword_sends_low_acuity_referral_to_the_llm(monkeypatch) -> None:
+    calls = []
+    referral = SimpleNamespace(disposition="Primary Care")
+
+    async def fake_cached_ainvoke(structured_llm, prompt, output_cls):
+        calls.append(output_cls)
+        return referral
+
+    monkeypatch.setattr("app.agents._cached_ainvoke", fake_cached_ainvoke)
+    state: TriageAgentState = {
+        "urgency_score": 2,
+        "referral_required": True,
+        "recommended_setting": CareSetting.PRIMARY_CARE,
+        "messages": [HumanMessage(content="My arm weakness comes and goes.")],
+    }
+    update = await referral_builder_agent(state)
+    assert update["referral_package"] is referral
+    assert len(calls) == 1
+
+
+async def test_micro_batcher_coalesces_concurrent_calls() -> None:
+    batches = []
+
+    async def abatch(prompts, config, return_exceptions):
+        batches.append(list(prompts))
+        await asyncio.sleep(0.01)
+        return [f"answer {prompt}" for prompt in prompts]
+
+    batcher = _MicroBatcher(SimpleNamespace(abatch=abatch), window_seconds=0.01)
+    results = await asyncio.gather(*(batcher.ainvoke(n) for n in range(3)))
+
+    assert results == ["answer 0", "answer 1", "answer 2"]
+    assert batches == [[0, 1, 2]]
+
+
+async def test_micro_batcher_releases_callers_when_the_batch_is_cancelled() -> None:
+    started = asyncio.Event()
+
+    async def abatch(prompts, config, return_exceptions):
+        started.set()
+        await asyncio.sleep(60)
+
+    batcher = _MicroBatcher(SimpleNamespace(abatch=abatch))
+    caller = asyncio.create_task(batcher.ainvoke("prompt"))
+    await asyncio.sleep(0)
+    flush_task = batcher._flush_task
+    assert flush_task is not None
+    await started.wait()
+    flush_task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(caller, timeout=1)
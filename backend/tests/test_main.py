@@ -0,0 +1,158 @@
+"""Tests for the FastAPI agent proxy."""
+
+import asyncio
+from collections.abc import AsyncIterator
+
+import httpx
+import orjson
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from app import main
+
+TRIAGE_REQUEST = {"agent_type": "triage", "user_message": "It started yesterday"}
+TRIAGE_RESULT = main.TriageOutput(
+    symptoms=["cough"],
+    chief_complaint="cough",
+    urgency_score=2,
+    assessment="Mild cough",
+    handoff_ready=False,
+    response_text="How long have you had the cough?",
+)
+
+
+@pytest.fixture
+async def client(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[httpx.AsyncClient]:
+    """An API client running the app's lifespan, with Azure auth and caching disabled."""
+    monkeypatch.setattr(main, "_BEARER_AUTH_ENABLED", False)
+    monkeypatch.setattr(main, "_RESPONSE_CACHE_MAX_ENTRIES", 0)
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            yield client
+
+
+def _fake_triage_llm(monkeypatch: pytest.MonkeyPatch, calls: list[object], fail: bool = False):
+    async def run(messages: object) -> main.TriageOutput:
+        calls.append(messages)
+        await asyncio.sleep(0.05)
+        if fail:
+            raise RuntimeError("model unavailable")
+        return TRIAGE_RESULT
+
+    monkeypatch.setitem(main._AGENT_LLMS, "triage", RunnableLambda(run))
+
+
+def _sse_events(body: str) -> list[tuple[str, dict[str, object]]]:
+    events = []
+    for frame in body.strip().split("\n\n"):
+        event_line, data_line = frame.split("\n")
+        events.append((event_line.removeprefix("event: "), orjson.loads(data_line[6:])))
+    return events
+
+
+async def test_saturated_service_answers_503_with_retry_after(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[object] = []
+    _fake_triage_llm(monkeypatch, calls)
+    monkeypatch.setattr(main, "_LLM_SLOT_WAIT_SECONDS", 0.01)
+    slots: asyncio.Semaphore = main.app.state.llm_slots
+    for _ in range(main._MAX_CONCURRENT_LLM_CALLS):
+        await slots.acquire()
+
+    invoke = await client.post("/agent/invoke", json=TRIAGE_REQUEST)
+    stream = await client.post("/agent/invoke/stream", json=TRIAGE_REQUEST)
+
+    for response in (invoke, stream):
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    assert calls == []
+
+
+async def test_identical_concurrent_invokes_share_one_llm_call(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[object] = []
+    _fake_triage_llm(monkeypatch, calls)
+
+    responses = await asyncio.gather(
+        *(client.post("/agent/invoke", json=TRIAGE_REQUEST) for _ in range(3))
+    )
+
+    assert len(calls) == 1
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert {response.json()["response_text"] for response in responses} == {
+        TRIAGE_RESULT.response_text
+    }
+    assert main._inflight_invokes == {}
+
+
+async def test_coalesced_invoke_failure_reaches_every_caller(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[object] = []
+    _fake_triage_llm(monkeypatch, calls, fail=True)
+
+    responses = await asyncio.gather(
+        *(client.post("/agent/invoke", json=TRIAGE_REQUEST) for _ in range(3))
+    )
+
+    assert len(calls) == 1
+    for response in responses:
+        assert response.status_code == 500
+        assert "model unavailable" in response.json()["detail"]
+
+
+async def test_physicians_revalidation_answers_304(client: httpx.AsyncClient) -> None:
+    first = await client.get("/physicians")
+    etag = first.headers["ETag"]
+
+    revalidated = await client.get("/physicians", headers={"If-None-Match": etag})
+    stale = await client.get("/physicians", headers={"If-None-Match": '"stale"'})
+
+    assert first.status_code == 200
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.content == b""
+    assert stale.status_code == 200
+    assert stale.json() == first.json()
+
+
+async def test_stream_emits_deltas_then_result(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    streaming_llm = FakeListChatModel(
+        responses=[TRIAGE_RESULT.model_dump_json()]
+    ) | PydanticOutputParser(pydantic_object=main.TriageOutput)
+    monkeypatch.setitem(main._AGENT_LLMS, "triage", streaming_llm)
+
+    response = await client.post("/agent/invoke/stream", json=TRIAGE_REQUEST)
+    events = _sse_events(response.text)
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == "result"
+    assert set(kinds[:-1]) == {"delta"}
+    assert "".join(str(data["delta"]) for _, data in events[:-1]) == (
+        TRIAGE_RESULT.model_dump_json()
+    )
+    assert events[-1][1]["structured_output"] == TRIAGE_RESULT.model_dump()
+    assert main.app.state.llm_slots._value == main._MAX_CONCURRENT_LLM_CALLS
+
+
+async def test_stream_reports_agent_failure_as_error_event(
+    client: httpx.AsyncClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[object] = []
+    _fake_triage_llm(monkeypatch, calls, fail=True)
+
+    response = await client.post("/agent/invoke/stream", json=TRIAGE_REQUEST)
+
+    assert response.status_code == 200
+    [(kind, data)] = _sse_events(response.text)
+    assert kind == "error"
+    assert "model unavailable" in str(data["detail"])
+    assert main.app.state.llm_slots._value == main._MAX_CONCURRENT_LLM_CALLS
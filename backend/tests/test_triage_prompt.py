@@ -0,0 +1,43 @@
+"""Tests for the red-flag keyword scanner."""
+
+import pytest
+
+from app.utils.triage_prompt import _RED_FLAG_PHRASES, detect_red_flags
+
+
+@pytest.mark.parametrize(("phrase", "flag"), sorted(_RED_FLAG_PHRASES.items()))
+def test_each_phrase_maps_to_its_flag(phrase: str, flag: str) -> None:
+    assert detect_red_flags(f"Patient says: {phrase}, since this morning.") == {flag}
+
+
+def test_matching_ignores_case() -> None:
+    assert detect_red_flags("CHEST PAIN and Slurred Speech") == {
+        "chest pain/pressure",
+        "stroke symptoms",
+    }
+
+
+@pytest.mark.parametrize(
+    ("text", "flag"),
+    [
+        ("ſuicidal thoughts", "suicidal ideation"),
+        ("confuſed", "altered mental status/confusion"),
+        ("I want to Kill myself", "suicidal ideation"),
+    ],
+)
+def test_unicode_case_variants_map_to_their_flag(text: str, flag: str) -> None:
+    assert detect_red_flags(text) == {flag}
+
+
+def test_phrases_only_match_whole_words() -> None:
+    assert detect_red_flags("My chest pains come and go; I feel unconfused.") == frozenset()
+
+
+def test_text_without_red_flags() -> None:
+    assert detect_red_flags("I have had a mild cough for two days.") == frozenset()
+
+
+def test_several_phrases_for_one_flag_collapse() -> None:
+    assert detect_red_flags("I fainted, then passed out again.") == {
+        "loss of consciousness/fainting"
+    }